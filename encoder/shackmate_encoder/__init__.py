@@ -0,0 +1,30 @@
+"""
+ShackMate encoder core library.
+
+    from shackmate_encoder import EncoderEngine
+    eng = EncoderEngine("m5")          # or "legacy", or a driver instance
+    eng.subscribe(print); eng.poll()
+
+Submodules load on first attribute access, so importing the package pulls in
+neither smbus2 nor websockets.
+"""
+
+import importlib
+
+__all__ = ["EncoderEngine", "ChannelState", "VersionedSnapshot", "WIRE_FORMATS",
+           "EncoderWSServer", "open_driver", "DRIVERS"]
+
+_LAZY = {
+    "EncoderEngine": ".core", "ChannelState": ".core", "VersionedSnapshot": ".core", "WIRE_FORMATS": ".core",
+    "EncoderWSServer": ".server",
+    "open_driver": ".drivers", "DRIVERS": ".drivers",
+}
+
+def __getattr__(name:str):
+    mod=_LAZY.get(name)
+    if mod is None: raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    val=getattr(importlib.import_module(mod, __name__), name)
+    globals()[name]=val
+    return val
+
+def __dir__(): return sorted(list(globals())+__all__)
@@ -0,0 +1,127 @@
+"""
+Command line entry point: `python -m shackmate_encoder [--driver m5|legacy] ...`.
+
+Also used by the two historical scripts (encoder/8encoder.py, encoder_server.py),
+which only differ in their default driver.
+"""
+
+import json, signal, sys, time
+from typing import Optional
+from . import smlog
+from .drivers import DRIVERS, I2C_BUS, I2C_ADDR
+from .smtrace import DEFAULT_RECORDS
+
+log_loop = smlog.get("loop")
+
+def _install_signals(srv):
+    def _h(sig,frm): log_loop.info("🛑 Shutting down…"); srv.stop()
+    signal.signal(signal.SIGINT,_h); signal.signal(signal.SIGTERM,_h)
+
+def _import_net():
+    """Worker thread: load the network stack while the main thread opens the device."""
+    try: import asyncio, websockets.server   # noqa: F401
+    except ImportError: pass                  # reported by ws_server() when serving starts
+
+def _serve_main(driver:str, capture:Optional[str]=None, capture_records:int=DEFAULT_RECORDS)->int:
+    import threading
+    pre=threading.Thread(target=_import_net, name="net-import", daemon=True); pre.start()
+    from .core import EncoderEngine
+    trace=None
+    if capture:
+        from .smtrace import TraceWriter
+        trace=TraceWriter(capture, capture_records)
+        log_loop.info("Capturing I2C trace to %s (%d records)", capture, capture_records)
+    eng=EncoderEngine(driver, trace=trace)   # I2C init sleeps release the GIL for the import above
+    pre.join()
+    import asyncio
+    from .server import EncoderWSServer
+    srv=EncoderWSServer(eng); _install_signals(srv)
+    try: asyncio.run(srv.run())
+    except KeyboardInterrupt: pass
+    finally:
+        srv.cleanup(); smlog.shutdown()
+    return 0
+
+def _calibrate_main(driver:str, cycles:int)->int:
+    """Sweep I2C timings against the live device and store the result."""
+    from .drivers import open_driver
+    from .i2ctiming import TimingStore, calibrate, device_key
+    dev=open_driver(driver, I2C_BUS, I2C_ADDR)
+    try:
+        key=device_key(I2C_BUS, I2C_ADDR, dev.read_firmware_version())
+        log_loop.info("Calibrating %s (%d cycles per step)…", key, cycles)
+        t=calibrate(dev, cycles)
+        TimingStore().save(key, t, cycles=cycles)
+        log_loop.info("Saved %r for %s", t, key)
+        return 0
+    finally:
+        try: dev.close()
+        except Exception: pass
+
+def _replay_main(path:str, frames:bool=False, profile:bool=False)->int:
+    """Feed a captured trace through read_cycle as fast as possible and report."""
+    from .core import EncoderEngine
+    from .drivers.m5 import M5_8EncoderReplay
+    from .smtrace import TraceReader, ReplaySource
+    reader=TraceReader(path); src=ReplaySource(reader)
+    eng=EncoderEngine(M5_8EncoderReplay(src, I2C_ADDR), clock=src.now)
+    prof=None
+    if profile:
+        import cProfile; prof=cProfile.Profile()
+    tick=flaps=0; online=eng.device_online; truncated=False
+    t0=time.perf_counter()
+    if prof: prof.enable()
+    # writes left over at a cycle start were issued by the previous cycle
+    while src.skip_writes():
+        pos=src.position
+        eng.read_cycle(tick); tick+=1
+        if src.position==pos: src.skip(1)         # nothing matched: don't spin
+        if eng.device_online!=online:
+            if src.exhausted and not eng.device_online:
+                truncated=True; break             # trace ended mid-cycle
+            flaps+=1; online=eng.device_online
+        if frames:
+            v=eng.snap.version
+            if eng.sync_version()!=v: print(eng.encoded_snapshot())
+    if prof: prof.disable()
+    dt=time.perf_counter()-t0
+    print(f"replayed {len(reader)} records{' (ring wrapped)' if reader.wrapped else ''} in {tick} ticks, "
+          f"{dt*1000.0:.1f} ms ({dt*1e6/max(1,tick):.1f} us/tick)")
+    print(f"online flaps: {flaps}, skipped records: {src.skipped}, unmatched calls: {src.unmatched}"
+          f"{', last cycle truncated' if truncated else ''}")
+    print("final:", json.dumps(eng.snapshot()))
+    if prof:
+        import pstats; pstats.Stats(prof).sort_stats("cumulative").print_stats(25)
+    return 0
+
+def main(argv=None, default_driver:str="m5")->int:
+    import argparse
+    from .i2ctiming import CAL_CYCLES
+    ap=argparse.ArgumentParser(description="ShackMate Encoder WS Server")
+    ap.add_argument("--driver", choices=sorted(DRIVERS), default=default_driver, help="device protocol (default: %(default)s)")
+    ap.add_argument("--calibrate", action="store_true", help="sweep I2C timings, save them for this device and exit (m5)")
+    ap.add_argument("--cycles", type=int, default=CAL_CYCLES, help="read passes per calibration step")
+    ap.add_argument("--capture", metavar="FILE", help="record every I2C transaction into a ring file (m5)")
+    ap.add_argument("--capture-records", type=int, default=DEFAULT_RECORDS, help="ring size in records (20 bytes each)")
+    ap.add_argument("--replay", metavar="FILE", help="run a captured m5 trace through read_cycle offline and exit")
+    ap.add_argument("--frames", action="store_true", help="with --replay: print every changed snapshot")
+    ap.add_argument("--profile", action="store_true", help="with --replay: cProfile the processing path")
+    args=ap.parse_args(argv)
+    if args.driver!="m5" and (args.calibrate or args.capture):
+        ap.error("--calibrate and --capture need --driver m5")
+    if args.capture_records<1:
+        ap.error("--capture-records must be at least 1")
+    if args.replay:
+        smlog.setup()
+        try: return _replay_main(args.replay, args.frames, args.profile)
+        finally: smlog.shutdown()
+    print(f"🎛️ ShackMate Encoder WS Server ({args.driver}) on :4008")
+    print("=======================================================", flush=True)
+    smlog.setup()
+    if args.calibrate:
+        try: return _calibrate_main(args.driver, args.cycles)
+        finally: smlog.shutdown()
+    return _serve_main(args.driver, args.capture, args.capture_records)
+
+if __name__=="__main__":
+    sys.exit(main())
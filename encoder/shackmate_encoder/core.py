@@ -0,0 +1,581 @@
+"""
+Transport-free encoder core: per-channel state, detent/velocity/accel processing,
+button and switch handling, LED policy and the command set.
+
+Both server entry points and programmatic tools drive an EncoderEngine; the
+WebSocket layer (server.py) only adds clients, frames and broadcasts.
+"""
+
+import json, math, time
+from typing import Callable, List, Optional, Tuple
+from . import smlog
+from .drivers import I2C_BUS, I2C_ADDR, open_driver
+from .i2ctiming import TimingStore, AdaptiveTuner, device_key
+
+# ---------- Config ----------
+BTN_EVERY     = 1
+SW_EVERY      = 1
+
+BUTTON_DEBOUNCE_MS  = 25
+LONG_PRESS_MS       = 1000
+
+# Velocity window (ticks) and default acceleration curve for the "accel" output.
+# Curve: (detents/s, gain) points, linearly interpolated, clamped at both ends.
+VEL_SLOTS           = 16      # ~200ms at 80Hz
+ACCEL_CURVE_DEFAULT = ((0, 1.0), (8, 1.0), (25, 4.0), (60, 12.0))
+ACCEL_GAIN_MAX      = 100.0   # keeps accel steps bounded whatever a client sends
+
+ON_COLOR_DEFAULT    = (0, 0, 200)   # blue
+OFF_COLOR_DEFAULT   = (0, 0, 0)
+ON_COLOR_SWITCH     = (0, 200, 0)   # green
+OFF_COLOR_SWITCH    = (200, 0, 0)   # red
+
+FX_HOLD_MS, FX_SWEEP_MS, FX_FADE_MS, FX_MIN_STEP_MS = 80, 300, 500, 30
+
+# How many frames to force-direct repaint after switch goes ON
+REPAINT_FRAMES_ON_SWITCH = 4   # ~50ms at 80Hz
+
+ADAPT_TIMING = True   # nudge pause/gap at runtime when the retry rate drifts
+log_btn, log_sw, log_loop = smlog.get("btn"), smlog.get("sw"), smlog.get("loop")
+
+# commands that only make sense with LEDs on the driver
+_LED_CMDS = frozenset(("identify","diag_off","set_encoder_colors","clear_encoder_colors",
+                       "set_default_colors","set_switch_colors","set_led","clear_led"))
+
+_RGB_OFF, _RGB_UNKNOWN = (0,0,0), (-1,-1,-1)   # LED cache sentinels
+
+def _ok(**extra)->dict: return {"ok":True, **extra}
+def _err(m:str)->dict:  return {"ok":False, "error":m}
+def _is_idx(v, n:int)->bool: return isinstance(v,int) and 0<=v<n
+def _rgb(v)->Optional[Tuple[int,int,int]]:
+    if (not isinstance(v,(list,tuple)) or len(v)!=3 or any(type(c) is not int or c<0 or c>255 for c in v)):
+        return None
+    return (v[0],v[1],v[2])
+
+async def _sleep(s:float):
+    # asyncio stays out of core's imports: the service entry point (__main__) builds the
+    # engine while asyncio/websockets load on a worker thread. Only reached inside a loop.
+    import asyncio
+    await asyncio.sleep(s)
+
+# ---------- Channel state (preallocated lists) ----------
+class ChannelState:
+    """Per-encoder state as preallocated lists, allocated once and updated in place.
+
+    Lists rather than array.array: the hot loop reads far more than it writes, and
+    every array read boxes a fresh int/float while a list slot returns the stored
+    object. LED frames hold one (r,g,b) tuple per slot, so a cache check is one
+    tuple compare and steady colors are shared references, not copies.
+    """
+    __slots__=("n","positions","prev_positions","cnt","last_cnt","residual",
+               "btn_buf","btn_raw","buttons","prev_buttons",
+               "press_start_ms","press_long_done","last_press_ms","led_toggled",
+               "fx_active","fx_dir","fx_start_ms","fx_last_upd_ms",
+               "led_rgb","desired",
+               "accel","prev_accel","accel_res","vel_hist","vel_sum","vel_t","vel_head")
+    def __init__(self, n:int, leds:int, vel_slots:int=VEL_SLOTS):
+        self.n=n
+        # telemetry + change detection
+        self.positions=[0]*n;  self.prev_positions=[0]*n
+        self.accel=[0]*n;      self.prev_accel=[0]*n
+        self.buttons=[0]*n;    self.prev_buttons=[0]*n
+        # counters -> detents
+        self.cnt=[0]*n; self.last_cnt=[0]*n; self.residual=[0]*n
+        # velocity: |detents| per tick in a ring (channel-major, vel_slots each) + running sums;
+        # vel_t holds the tick timestamps shared by all channels
+        self.vel_hist=[0]*(n*vel_slots); self.vel_sum=[0]*n
+        self.vel_t=[0.0]*vel_slots; self.vel_head=0
+        self.accel_res=[0.0]*n
+        # buttons (raw bytes, -1 = failed read)
+        self.btn_buf=[0]*n; self.btn_raw=[0]*n
+        self.press_start_ms=[0.0]*n; self.press_long_done=[0]*n
+        self.last_press_ms=[0.0]*n
+        # persistent LED toggle state (preserved across switch changes)
+        self.led_toggled=[0]*n
+        # FX
+        self.fx_active=[0]*n; self.fx_dir=[0]*n
+        self.fx_start_ms=[0.0]*n; self.fx_last_upd_ms=[0.0]*n
+        # LED cache (what we believe is on device) and the frame being computed
+        self.led_rgb=[_RGB_OFF]*leds; self.desired=[_RGB_OFF]*leds
+
+# ---------- Versioned snapshot ----------
+WIRE_FORMATS = {"json": json.dumps}   # name -> encoder(dict) for snapshot frames
+
+class VersionedSnapshot:
+    """Telemetry version counter with encoded frames memoized per (version, second).
+
+    The "time" field only has 1s resolution, so a frame stays valid until the
+    state changes or the wall-clock second rolls over.
+    """
+    __slots__=("version","_key_ver","_key_sec","_cache","_sec","_hms")
+    def __init__(self):
+        self.version=0; self._key_ver=-1; self._key_sec=-1; self._cache={}
+        self._sec=-1; self._hms=""
+    def bump(self): self.version+=1
+    def hms(self)->str:
+        sec=int(time.time())
+        if sec!=self._sec:
+            self._sec=sec; self._hms=time.strftime("%H:%M:%S", time.localtime(sec))
+        return self._hms
+    def encoded(self, build, fmt:str="json"):
+        hms=self.hms()
+        if self._key_ver!=self.version or self._key_sec!=self._sec:
+            self._key_ver=self.version; self._key_sec=self._sec; self._cache.clear()
+        out=self._cache.get(fmt)
+        if out is None: out=self._cache[fmt]=WIRE_FORMATS[fmt](build(hms))
+        return out
+
+# ---------- Engine ----------
+class EncoderEngine:
+    """Polls one driver and turns raw reads into telemetry, LED frames and command replies.
+
+    `driver` is a name from drivers.DRIVERS (opened on bus/addr; timing from a previous
+    --calibrate run is loaded and tuned at runtime) or a driver instance the caller owns.
+    """
+    def __init__(self, driver="m5", clock=time.monotonic, trace=None,
+                 bus:int=I2C_BUS, addr:int=I2C_ADDR):
+        # `clock` (monotonic seconds) drives debounce, long press and FX timing
+        self.clock=clock
+        self.tuner=None; self.device_key=None
+        if isinstance(driver,str):
+            self.dev=open_driver(driver, bus, addr); self._owned=True
+            if trace is not None: self.dev.trace=trace
+            if self.dev.tunable:
+                # Per-device timing from a previous --calibrate run, if any
+                self.device_key=device_key(bus, addr, self.dev.read_firmware_version())
+                saved=TimingStore().load(self.device_key)
+                if saved:
+                    self.dev.timing.update(saved)
+                    log_loop.info("Loaded timing for %s: %r", self.device_key, self.dev.timing)
+                self.tuner=AdaptiveTuner(self.dev, self.dev.timing) if ADAPT_TIMING else None
+        else:
+            # injected driver (replay, tests, embedding): caller owns bus and timing
+            self.dev=driver; self._owned=False
+        n=self.dev.encoders
+
+        # Per-channel state (positions, buttons, toggles, FX, LED cache)
+        self.st=ChannelState(n, self.dev.leds)
+        self._enc_keys=tuple(f"enc{i}" for i in range(n))
+
+        # Telemetry
+        self.switch_state=0
+        self.device_online=True
+
+        # Colors
+        self.enc_on_color=[None]*n   # type: List[Optional[Tuple[int,int,int]]]
+        self.enc_off_color=[None]*n
+        self.switch_color_on=ON_COLOR_SWITCH
+        self.switch_color_off=OFF_COLOR_SWITCH
+        self.on_color_default=ON_COLOR_DEFAULT
+        self.off_color_default=OFF_COLOR_DEFAULT
+
+        # Acceleration curves (None -> ACCEL_CURVE_DEFAULT)
+        self.accel_curve=[None]*n   # type: List[Optional[Tuple[Tuple[float,float],...]]]
+
+        # After switch->ON, force N direct repaints
+        self._repaint_frames:int = 0
+
+        # Change detection; a device that is offline at start is baselined on its first good read
+        self._rebase=False
+        try: self.dev.read_all_counters(self.st.last_cnt)
+        except Exception as e:
+            log_loop.warning("[init] %s", e); self.device_online=False; self._rebase=True
+        self.prev_switch=self.switch_state
+        self.prev_online=self.device_online
+
+        self.snap=VersionedSnapshot()
+        self._subs=[]; self._notified=-1; self._tick=0
+
+        self._apply_led_policy(initial=True)
+
+    # ---- snapshot / versioning ----
+    def snapshot(self, hms:Optional[str]=None)->dict:
+        return {"time":hms or self.snap.hms(),"encoders":self.st.positions[:],
+                "accel":self.st.accel[:],
+                "buttons":self.st.buttons[:],"switch":self.switch_state,
+                "online":1 if self.device_online else 0}
+    def has_changes(self)->bool:
+        st=self.st
+        return (st.positions!=st.prev_positions or
+                st.accel!=st.prev_accel or
+                st.buttons!=st.prev_buttons or
+                self.switch_state!=self.prev_switch or
+                self.device_online!=self.prev_online)
+    def commit_prev(self):
+        st=self.st
+        st.prev_positions[:]=st.positions
+        st.prev_accel[:]=st.accel
+        st.prev_buttons[:]=st.buttons
+        self.prev_switch=self.switch_state
+        self.prev_online=self.device_online
+    def sync_version(self)->int:
+        """Bump the state version if telemetry moved since the last sync."""
+        if self.has_changes(): self.commit_prev(); self.snap.bump()
+        return self.snap.version
+    def encoded_snapshot(self, fmt:str="json"):
+        """Current snapshot in `fmt`, encoded at most once per state version and second."""
+        self.sync_version()
+        return self.snap.encoded(self.snapshot, fmt)
+
+    # ---- math helpers ----
+    def _gradient_color(self, sgn:int, u:float)->Tuple[int,int,int]:
+        # blue->green->red sweep (reversed for sgn<0); t is the position within each half
+        u=0.0 if u<0.0 else (1.0 if u>1.0 else u)
+        t=u*2 if u<0.5 else (u-.5)*2
+        up=int(255*t); dn=int(255-255*t)
+        if sgn>=0: return (0,up,dn) if u<0.5 else (up,dn,0)
+        return (dn,up,0) if u<0.5 else (0,dn,up)
+    @staticmethod
+    def _accel_gain(curve, v:float)->float:
+        v0,g0=curve[0]
+        if v<=v0: return g0
+        for v1,g1 in curve:             # first pair is a no-op step (v > v0)
+            if v<=v1: return g0+(g1-g0)*(v-v0)/(v1-v0) if v1>v0 else g1
+            v0,g0=v1,g1
+        return g0
+    @staticmethod
+    def _parse_curve(c)->Optional[Tuple[Tuple[float,float],...]]:
+        """[[detents_per_s, gain], ...] with finite non-decreasing speeds and 0 < gain <= ACCEL_GAIN_MAX, else None."""
+        if not isinstance(c,(list,tuple)) or not c: return None
+        out=[]; prev=0.0
+        for p in c:
+            if (not isinstance(p,(list,tuple)) or len(p)!=2 or
+                any(isinstance(x,bool) or not isinstance(x,(int,float)) for x in p)): return None
+            try: v,g=float(p[0]),float(p[1])
+            except OverflowError: return None      # huge JSON ints
+            if not (math.isfinite(v) and math.isfinite(g)): return None   # json.loads accepts NaN/Infinity
+            if v<prev or not (0.0<g<=ACCEL_GAIN_MAX): return None
+            out.append((v,g)); prev=v
+        return tuple(out)
+
+    # ---- LED helpers (dual-bank) ----
+    def _set_led_direct(self, idx:int, rgb):
+        self.dev.set_led_rgb_dual(idx, *rgb)
+        if 0<=idx<self.dev.leds: self.st.led_rgb[idx]=tuple(rgb)
+    def _set_led_cached(self, idx:int, rgb):
+        if not (0<=idx<self.dev.leds): return
+        c=self.st.led_rgb
+        if c[idx]!=rgb:
+            self.dev.set_led_rgb_dual(idx, rgb[0], rgb[1], rgb[2]); c[idx]=rgb
+    def _fill_led_cache(self, rgb):
+        c=self.st.led_rgb
+        for k in range(len(c)): c[k]=rgb
+    def _clear_led_cache(self): self._fill_led_cache(_RGB_UNKNOWN)
+    def _flush_desired(self, direct:bool):
+        """Write the computed frame: every LED when `direct`, else only what differs from cache."""
+        d=self.st.desired; c=self.st.led_rgb; set_rgb=self.dev.set_led_rgb_dual
+        for idx in range(len(d)):
+            rgb=d[idx]
+            if direct or c[idx]!=rgb:
+                set_rgb(idx, rgb[0], rgb[1], rgb[2]); c[idx]=rgb
+
+    def _reset_channel(self, i:int):
+        st=self.st
+        st.positions[i]=0; st.residual[i]=0; st.last_cnt[i]=0
+        st.accel[i]=0; st.accel_res[i]=0.0
+        self.dev.reset_counter(i); st.fx_active[i]=0
+
+    # ---- main cycle ----
+    def read_cycle(self, tick:int):
+        now_ms=self.clock()*1000.0
+        st=self.st; n=st.n; cpd=self.dev.counts_per_detent
+        try:
+            # 1) counters -> detents (truncating division, remainder carried per channel)
+            cnt=self.dev.read_all_counters(st.cnt)
+            if self._rebase: st.last_cnt[:]=cnt; self._rebase=False
+            last=st.last_cnt; res=st.residual; pos=st.positions
+            # velocity ring: slot h is the oldest tick and is overwritten by this one
+            hist=st.vel_hist; vsum=st.vel_sum; W=len(st.vel_t); h=st.vel_head
+            span_s=max(W/self.dev.timing.loop_hz, (now_ms-st.vel_t[h])/1000.0)
+            st.vel_t[h]=now_ms; st.vel_head=(h+1)%W
+            fx_arm=(self.switch_state==1)
+            gain=self._accel_gain; curves=self.accel_curve; acc=st.accel; ares=st.accel_res
+            fxa=st.fx_active; fxd=st.fx_dir; fxs=st.fx_start_ms; fxu=st.fx_last_upd_ms
+            tally=smlog.tally; keys=self._enc_keys
+            for i in range(n):
+                c=cnt[i]; k=i*W+h
+                if c==last[i]:
+                    # idle channel (|residual| < cpd, so no detent): just age out its velocity slot
+                    old=hist[k]
+                    if old: vsum[i]-=old; hist[k]=0
+                    continue
+                total=res[i]+c-last[i]; last[i]=c
+                q=total//cpd if total>=0 else -((-total)//cpd)
+                res[i]=total-q*cpd
+                aq=q if q>=0 else -q
+                vsum[i]+=aq-hist[k]; hist[k]=aq
+                if q:
+                    pos[i]+=q; tally(keys[i], q)
+                    # accel: q scaled by the curve gain at the window speed; fractions carry
+                    g=gain(curves[i] or ACCEL_CURVE_DEFAULT, vsum[i]/span_s)
+                    r=ares[i]
+                    if r*q<0: r=0.0   # direction change: drop carried fraction
+                    a=r+q*g; iq=int(a)
+                    acc[i]+=iq; ares[i]=a-iq
+                    if fx_arm and not st.led_toggled[i]:
+                        fxa[i]=1; fxd[i]=1 if q>0 else -1
+                        fxs[i]=now_ms; fxu[i]=0.0
+
+            # 2) buttons (short vs long; drivers without button_actions only report state)
+            if tick % BTN_EVERY == 0:
+                raw=self.dev.read_all_buttons_raw(st.btn_buf)
+                prev_raw=st.btn_raw; btn=st.buttons; inv=self.dev.invert_buttons
+                acts=self.dev.button_actions
+                for i in range(n):
+                    r=raw[i]; pr=prev_raw[i]
+                    if r<0: r=pr   # failed read: hold previous
+                    if inv: prev=0 if pr else 1; cur=0 if r else 1
+                    else:   prev=1 if pr>0 else 0; cur=1 if r>0 else 0
+                    if cur!=prev: log_btn.debug("🔘 Button %d: %d → %d", i, prev, cur)
+                    if not acts: btn[i]=cur; prev_raw[i]=r; continue
+                    # steady and no long press pending: nothing to do (btn[i] already == cur)
+                    if r==pr and (cur==0 or st.press_long_done[i]): continue
+                    if prev==0 and cur==1:
+                        st.press_start_ms[i]=now_ms; st.press_long_done[i]=0
+                    if cur==1 and not st.press_long_done[i]:
+                        if (now_ms - st.press_start_ms[i]) >= LONG_PRESS_MS:
+                            self._reset_channel(i)
+                            st.press_long_done[i]=1
+                    if prev==1 and cur==0:
+                        held=now_ms - st.press_start_ms[i]
+                        if not st.press_long_done[i] and held < LONG_PRESS_MS:
+                            if (now_ms - st.last_press_ms[i]) >= BUTTON_DEBOUNCE_MS:
+                                st.led_toggled[i]=0 if st.led_toggled[i] else 1
+                                st.last_press_ms[i]=now_ms
+                                if st.led_toggled[i]: st.fx_active[i]=0
+                        st.press_start_ms[i]=0.0; st.press_long_done[i]=0
+                    btn[i]=cur; prev_raw[i]=r
+
+            # 3) switch each loop
+            if tick % SW_EVERY == 0:
+                sw=self.dev.read_switch()
+                if sw is not None and sw != self.switch_state:
+                    self.switch_state=sw
+                    log_sw.info("[SW] -> %s", 'ON' if sw else 'OFF')
+                    self._clear_led_cache()  # repaint next apply
+                    if sw==0:
+                        # OFF: stop FX and blast off
+                        for i in range(n): st.fx_active[i]=0
+                        self.dev.hard_off_all_leds()
+                        self._fill_led_cache(_RGB_OFF)
+                        self._repaint_frames = 0
+                    else:
+                        # ON: start a short repaint window to force LEDs back on
+                        self._repaint_frames = REPAINT_FRAMES_ON_SWITCH
+
+            # 4) LEDs
+            self._apply_led_policy(now_ms)
+
+            self.device_online=True
+        except Exception as e:
+            log_loop.warning("[read_cycle] %s", e)
+            self.device_online=False
+
+    def _apply_led_policy(self, now_ms:Optional[float]=None, initial:bool=False):
+        if not self.dev.leds: return
+        if now_ms is None: now_ms=self.clock()*1000.0
+        st=self.st; d=st.desired; c=st.led_rgb; sw_led=self.dev.switch_led
+
+        # switch LED always reflects state
+        sw_rgb = self.switch_color_on if self.switch_state==1 else self.switch_color_off
+
+        if self.switch_state==0:
+            self._set_led_cached(sw_led, sw_rgb)
+            # enforce visible OFF state (preserve toggles/states)
+            self.dev.hard_off_all_leds()
+            self._fill_led_cache(_RGB_OFF)
+            if initial: time.sleep(0.01)
+            return
+
+        # switch ON -> compute desired frame for all channels in one pass
+        d[sw_led]=sw_rgb
+        fxa=st.fx_active; fxu=st.fx_last_upd_ms; tog=st.led_toggled
+        for i in range(st.n):
+            if tog[i]:
+                fxa[i]=0
+                d[i]=self.enc_on_color[i] or self.on_color_default
+            elif fxa[i]:
+                if (now_ms - fxu[i]) >= FX_MIN_STEP_MS:
+                    t = now_ms - st.fx_start_ms[i]
+                    if t < FX_HOLD_MS: u, amp = 0.0, 1.0
+                    else:
+                        u = min(1.0, (t - FX_HOLD_MS)/max(1.0, FX_SWEEP_MS))
+                        amp = max(0.0, 1.0 - (t - FX_HOLD_MS)/max(1.0, FX_FADE_MS))
+                    fxu[i]=now_ms
+                    if amp <= 0.0:
+                        fxa[i]=0
+                        d[i]=self.enc_off_color[i] or self.off_color_default
+                    else:
+                        base = self._gradient_color(st.fx_dir[i], u)
+                        d[i]=(int(base[0]*amp), int(base[1]*amp), int(base[2]*amp))
+                else:
+                    # keep last color
+                    d[i]=c[i]
+            else:
+                d[i]=self.enc_off_color[i] or self.off_color_default
+
+        # During repaint window after switch->ON, force-direct write desired colors
+        if self._repaint_frames > 0:
+            self._flush_desired(direct=True)
+            self._repaint_frames -= 1
+        else:
+            self._flush_desired(direct=False)
+
+        if initial: time.sleep(0.01)
+
+    # ---- commands ----
+    def _repaint(self):
+        self._clear_led_cache(); self._apply_led_policy()
+        # nudge repaint if switch is ON
+        if self.switch_state==1: self._repaint_frames = max(self._repaint_frames, REPAINT_FRAMES_ON_SWITCH)
+
+    async def command(self, obj:dict)->dict:
+        """Apply one command object and return its reply dict ({"ok":True,...} or {"ok":False,"error":...}).
+
+        As on the WebSocket, "get" is answered with the state frame itself, not an ack.
+        """
+        if not isinstance(obj,dict): return _err("command must be a JSON object")
+        cmd = obj.get("cmd")
+        if not cmd: return _err("missing cmd")
+        if not isinstance(cmd,str): return _err(f"unknown cmd '{cmd}'")   # unhashable values can't hit the sets below
+        if cmd=="get": return self.snapshot()
+        n=self.st.n; leds=self.dev.leds
+        if cmd in _LED_CMDS and not leds: return _err(f"{cmd}: driver '{self.dev.name}' has no LEDs")
+        e_idx=f"idx 0..{n-1}"; l_idx=f"idx 0..{leds-1}"
+
+        if cmd=="identify":
+            idx=obj.get("idx")
+            if not _is_idx(idx,leds): return _err(l_idx)
+            self._set_led_direct(idx,(255,255,255)); await _sleep(1.0)
+            self._set_led_direct(idx,(0,0,0))
+            return _ok(cmd="identify", idx=idx)
+
+        if cmd=="diag_off":
+            self.dev.hard_off_all_leds()
+            self._fill_led_cache(_RGB_OFF)
+            return _ok(cmd="diag_off")
+
+        if cmd in ("set_encoder_colors","set_default_colors","set_switch_colors"):
+            idx=obj.get("idx"); on=obj.get("on"); off=obj.get("off")
+            if cmd=="set_encoder_colors" and not _is_idx(idx,n): return _err(e_idx)
+            on_rgb=_rgb(on); off_rgb=_rgb(off)
+            if on is not None and on_rgb is None: return _err("on must be [r,g,b] 0..255")
+            if off is not None and off_rgb is None: return _err("off must be [r,g,b] 0..255")
+            if cmd=="set_encoder_colors":
+                if on_rgb: self.enc_on_color[idx]=on_rgb
+                if off_rgb: self.enc_off_color[idx]=off_rgb
+                self._repaint()
+                return _ok(cmd=cmd, idx=idx, on=self.enc_on_color[idx], off=self.enc_off_color[idx])
+            if cmd=="set_default_colors":
+                if on_rgb: self.on_color_default=on_rgb
+                if off_rgb: self.off_color_default=off_rgb
+                self._repaint()
+                return _ok(cmd=cmd, on=self.on_color_default, off=self.off_color_default)
+            if on_rgb: self.switch_color_on=on_rgb
+            if off_rgb: self.switch_color_off=off_rgb
+            self._repaint()
+            return _ok(cmd=cmd, on=self.switch_color_on, off=self.switch_color_off)
+
+        if cmd=="clear_encoder_colors":
+            idx=obj.get("idx")
+            if not _is_idx(idx,n): return _err(e_idx)
+            self.enc_on_color[idx]=None; self.enc_off_color[idx]=None
+            self._repaint()
+            return _ok(cmd="clear_encoder_colors", idx=idx)
+
+        if cmd=="set_accel":
+            idx=obj.get("idx")
+            if not _is_idx(idx,n): return _err(e_idx)
+            curve=self._parse_curve(obj.get("curve"))
+            if curve is None: return _err(f"curve must be [[detents_per_s, gain], ...] with rising finite speeds and 0 < gain <= {ACCEL_GAIN_MAX:g}")
+            self.accel_curve[idx]=curve
+            return _ok(cmd="set_accel", idx=idx, curve=[list(p) for p in curve])
+
+        if cmd=="clear_accel":
+            idx=obj.get("idx")
+            if not _is_idx(idx,n): return _err(e_idx)
+            self.accel_curve[idx]=None
+            return _ok(cmd="clear_accel", idx=idx)
+
+        if cmd=="reset":
+            idx=obj.get("idx")
+            if not _is_idx(idx,n): return _err(e_idx)
+            self._reset_channel(idx)
+            return _ok(cmd="reset", idx=idx)
+
+        if cmd=="reset_all":
+            for i in range(n): self._reset_channel(i)
+            return _ok(cmd="reset_all")
+
+        if cmd=="log_level":
+            level=obj.get("level"); cat=obj.get("category")
+            if not isinstance(level,str): return _err("level must be a string")
+            if cat is not None and not isinstance(cat,str): return _err("category must be a string")
+            try: name=smlog.set_level(level, cat)
+            except ValueError as e: return _err(str(e))
+            return _ok(cmd="log_level", level=name, category=cat)
+
+        # Back-compat
+        if cmd=="set_led":
+            idx=obj.get("idx"); rgb=obj.get("rgb")
+            if not _is_idx(idx,leds): return _err(l_idx)
+            c=_rgb(rgb)
+            if c is None: return _err("rgb must be [r,g,b] 0..255")
+            if idx==self.dev.switch_led: self.switch_color_on=c
+            else: self.enc_on_color[idx]=c
+            self._repaint()
+            return _ok(cmd="set_led", idx=idx, rgb=rgb)
+
+        if cmd=="clear_led":
+            idx=obj.get("idx")
+            if not _is_idx(idx,leds): return _err(l_idx)
+            if idx==self.dev.switch_led: self.switch_color_on=ON_COLOR_SWITCH
+            else: self.enc_on_color[idx]=None
+            self._repaint()
+            return _ok(cmd="clear_led", idx=idx)
+
+        return _err(f"unknown cmd '{cmd}'")
+
+    # ---- loop & subscribers ----
+    def subscribe(self, fn:Callable[[dict],None])->Callable[[],None]:
+        """Call fn(snapshot) from the loop whenever telemetry changes; returns an unsubscribe callable."""
+        self._subs.append(fn)
+        return lambda: self._subs.remove(fn) if fn in self._subs else None
+
+    def _notify(self):
+        v=self.sync_version()
+        if v==self._notified: return
+        self._notified=v; snap=self.snapshot()
+        for fn in list(self._subs):
+            try: fn(snap)
+            except Exception as e: log_loop.warning("[subscriber] %s", e)
+
+    def poll(self)->dict:
+        """One synchronous read cycle (for tools without an event loop); returns the snapshot."""
+        self.read_cycle(self._tick); self._tick+=1
+        if self._subs: self._notify()
+        return self.snapshot()
+
+    async def run(self, stop, after_cycle=None):
+        """Read, then sleep 1/timing.loop_hz, until `stop` (asyncio.Event) is set; `after_cycle` is awaited after each read."""
+        timing=self.dev.timing
+        log_loop.info("🔍 Data loop started (%d Hz)", timing.loop_hz)
+        perf=time.perf_counter
+        while not stop.is_set():
+            t0=perf(); self.read_cycle(self._tick); cyc=perf()-t0; self._tick+=1
+            if self._subs: self._notify()
+            if after_cycle: await after_cycle()
+            if self.tuner: self.tuner.step(cycle_s=cyc)
+            await _sleep(max(0.001,1.0/timing.loop_hz))
+
+    def close(self):
+        """LEDs off; closes the driver (and its trace) if the engine opened it."""
+        try:
+            self.dev.hard_off_all_leds()
+            if self.dev.leds:
+                try: self.dev.set_led_rgb_dual(self.dev.switch_led,0,0,0)
+                except Exception: pass
+        finally:
+            if self._owned:
+                try: self.dev.close()
+                except Exception: pass
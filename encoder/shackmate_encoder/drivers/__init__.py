@@ -0,0 +1,33 @@
+"""
+Device drivers for the encoder engine, selected by name and imported on demand.
+
+A driver exposes:
+  attributes  name, bus_no, addr, encoders, leds, switch_led, counts_per_detent,
+              invert_buttons, button_actions (short press toggles LED, long press
+              resets), tunable, timing (I2CTiming), stats (I2CStats), trace
+  reads       read_all_counters(out) -> cumulative counts, read_all_buttons_raw(out)
+              (-1 = failed read); both fill and return `out`, a preallocated list
+              of ints (one slot per channel; a new list when None)
+              read_switch() -> 0/1/None, read_firmware_version()
+  writes      set_led_rgb_dual(idx, r, g, b), hard_off_all_leds(), reset_counter(idx)
+  lifecycle   open(bus_no, addr) classmethod, close()
+"""
+
+import importlib
+from typing import Dict, Tuple
+
+I2C_BUS, I2C_ADDR = 1, 0x41
+
+# name -> (module, class); only the selected module (and its smbus2 import) is loaded
+DRIVERS:Dict[str,Tuple[str,str]] = {
+    "m5":     (".m5",     "M5_8EncoderStopOnly"),   # STOP-only int32 counters, dual-bank LEDs, 80 Hz
+    "legacy": (".legacy", "LegacyByteDriver"),      # read_byte_data 8-bit increments, no LEDs, 100 Hz
+}
+
+def driver_class(name:str):
+    try: mod, cls = DRIVERS[name]
+    except KeyError: raise ValueError(f"unknown driver '{name}' (choose from {', '.join(sorted(DRIVERS))})")
+    return getattr(importlib.import_module(mod, __name__), cls)
+
+def open_driver(name:str, bus_no:int=I2C_BUS, addr:int=I2C_ADDR):
+    return driver_class(name).open(bus_no, addr)
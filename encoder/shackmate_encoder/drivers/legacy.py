@@ -0,0 +1,71 @@
+"""
+Original encoder_server.py protocol: one read_byte_data per register.
+
+Counter registers return a signed 8-bit increment since the last read; they are
+folded into cumulative counts here so the engine can diff them like the M5
+int32 counters. Buttons and switch are 0/1 (>0 = pressed/on). No LEDs.
+"""
+
+from typing import List, Optional
+from smbus2 import SMBus
+from ..i2ctiming import I2CTiming, I2CStats
+
+ENCODER_REG, BUTTON_REG, SWITCH_REG, FIRMWARE_VERSION_REG = 0x00, 0x50, 0x60, 0xFE
+UPDATE_RATE = 100  # Hz (10ms updates)
+
+class LegacyByteDriver:
+    name="legacy"; tunable=False
+    encoders, leds, switch_led = 8, 0, -1
+    counts_per_detent, invert_buttons = 1, False
+    button_actions = False    # buttons are reported only, as encoder_server.py always did
+
+    def __init__(self, bus, addr:int, bus_no:Optional[int]=None):
+        self.bus, self.addr, self.bus_no = bus, addr, bus_no
+        self.timing=I2CTiming(0.0, 0.0, 0.0, 1, UPDATE_RATE)
+        self.stats=I2CStats()
+        self.trace=None
+        self._cum=[0]*self.encoders
+
+    @classmethod
+    def open(cls, bus_no:int, addr:int)->"LegacyByteDriver":
+        return cls(SMBus(bus_no), addr, bus_no=bus_no)
+
+    def close(self):
+        if self.bus: self.bus.close()
+
+    def _read(self, reg:int)->int:
+        self.stats.ops+=1
+        try: return self.bus.read_byte_data(self.addr, reg)
+        except Exception: self.stats.failures+=1; raise
+
+    def read_firmware_version(self)->Optional[int]:
+        try: return self._read(FIRMWARE_VERSION_REG)
+        except Exception: return None
+
+    def read_all_counters(self, out:Optional[List[int]]=None)->List[int]:
+        """Fold each 8-bit increment into the running count and fill `out`; raises on a failed read."""
+        if out is None: out=[0]*self.encoders
+        cum=self._cum
+        for i in range(len(out)):
+            raw=self._read(ENCODER_REG+i)
+            cum[i]+=raw if raw<=127 else raw-256
+            out[i]=cum[i]
+        return out
+
+    def read_all_buttons_raw(self, out:Optional[List[int]]=None)->List[int]:
+        """Fill `out` with the raw button bytes; -1 marks a failed read."""
+        if out is None: out=[0]*self.encoders
+        for i in range(len(out)):
+            try: out[i]=self._read(BUTTON_REG+i)
+            except Exception: out[i]=-1
+        return out
+
+    def read_switch(self)->Optional[int]:
+        try: return 1 if self._read(SWITCH_REG)>0 else 0
+        except Exception: return None
+
+    def set_led_rgb_dual(self, idx:int, r:int, g:int, b:int): pass
+    def hard_off_all_leds(self): pass
+
+    def reset_counter(self, idx:int):
+        if 0 <= idx < self.encoders: self._cum[idx]=0
@@ -0,0 +1,175 @@
+"""
+M5Stack 8-Encoder unit (STM32F030), STOP-only protocol.
+
+Counters are signed int32 read with a register write, a short pause, then a
+separate read (no repeated start). LEDs are written to both plausible banks.
+Every attempt can be recorded into a trace ring (see smtrace).
+"""
+
+import struct, time
+from typing import List, Optional
+try:
+    from smbus2 import SMBus, i2c_msg
+except ImportError:          # offline replay needs no bus
+    SMBus = i2c_msg = None
+from ..i2ctiming import I2CTiming, I2CStats
+from ..smtrace import TraceWriter, ReplaySource, F_WRITE, F_FINAL, error_for
+
+# ---------- Config ----------
+LOOP_HZ       = 80      # defaults; overridden per device by --calibrate results
+PAUSE_S       = 0.00025
+BTN_GAP_S     = 0.00025
+MAX_RETRIES, BACKOFF_BASE = 3, 0.002
+
+SWITCH_INVERT       = False
+INVERT_BUTTONS      = True
+COUNTS_PER_DETENT   = 2
+
+# ---------- Registers ----------
+REG_CNT_BASE, REG_BTN_BASE, REG_SWITCH, REG_RST_BASE = 0x00, 0x50, 0x60, 0x40
+REG_LED_BANK0, REG_LED_BANK1 = 0x70, 0x80
+REG_FW_VERSION = 0xFE
+ENCODERS, BUTTONS, SWITCH_LED_INDEX, LEDS = 8, 8, 8, 9
+_I32 = struct.Struct("<i")
+
+# ---------- I2C (STOP-only, dual-bank LED writes) ----------
+class M5_8EncoderStopOnly:
+    name="m5"; tunable=True
+    encoders, leds, switch_led = ENCODERS, LEDS, SWITCH_LED_INDEX
+    counts_per_detent, invert_buttons = COUNTS_PER_DETENT, INVERT_BUTTONS
+    button_actions = True     # short press toggles the LED, long press resets the encoder
+
+    def __init__(self, bus, addr:int, timing:Optional[I2CTiming]=None, bus_no:Optional[int]=None):
+        self.bus, self.addr, self.bus_no = bus, addr, bus_no
+        self.timing=timing or I2CTiming(PAUSE_S, BTN_GAP_S, BACKOFF_BASE, MAX_RETRIES, LOOP_HZ)
+        self.stats=I2CStats()
+        self.trace:Optional[TraceWriter]=None   # set to capture every transaction attempt
+
+    @classmethod
+    def open(cls, bus_no:int, addr:int)->"M5_8EncoderStopOnly":
+        if SMBus is None: raise ImportError("smbus2 is required to open the m5 driver (pip install smbus2)")
+        return cls(SMBus(bus_no), addr, bus_no=bus_no)
+
+    def close(self):
+        if self.trace: self.trace.close()
+        if self.bus: self.bus.close()
+
+    def _retry_sleep(self, a:int):
+        self.stats.retries+=1; time.sleep(self.timing.backoff_base*(a+1))
+
+    def _read_stop(self, reg:int, n:int)->bytes:
+        last=None; t=self.timing; tr=self.trace; self.stats.ops+=1
+        for a in range(t.max_retries):
+            try:
+                self.bus.i2c_rdwr(i2c_msg.write(self.addr, [reg & 0xFF]))
+                if t.pause_s: time.sleep(t.pause_s)
+                r = i2c_msg.read(self.addr, n); self.bus.i2c_rdwr(r)
+                out=bytes(r)
+            except Exception as e:
+                last=e
+                if tr: tr.record(time.monotonic_ns(), F_FINAL if a==t.max_retries-1 else 0, reg, n, a, _errno(e), b"")
+                self._retry_sleep(a); continue
+            if tr: tr.record(time.monotonic_ns(), F_FINAL, reg, n, a, 0, out)
+            if a: self.stats.recovered+=a
+            return out
+        self.stats.failures+=1
+        raise last or OSError(121, "Remote I/O error")
+
+    def _write_stop(self, reg:int, data:bytes):
+        last=None; payload=bytes([reg & 0xFF]) + bytes(data); tr=self.trace; self.stats.ops+=1
+        tries=self.timing.max_retries
+        for a in range(tries):
+            try:
+                self.bus.i2c_rdwr(i2c_msg.write(self.addr, payload))
+            except Exception as e:
+                last=e
+                if tr: tr.record(time.monotonic_ns(), F_WRITE|(F_FINAL if a==tries-1 else 0), reg, len(data), a, _errno(e), payload[1:5])
+                self._retry_sleep(a); continue
+            if tr: tr.record(time.monotonic_ns(), F_WRITE|F_FINAL, reg, len(data), a, 0, payload[1:5])
+            if a: self.stats.recovered+=a
+            return
+        self.stats.failures+=1
+        raise last or OSError(121, "Remote I/O error")
+
+    def read_firmware_version(self)->Optional[int]:
+        try: return self._read_stop(REG_FW_VERSION,1)[0]
+        except Exception: return None
+
+    def read_all_counters(self, out:Optional[List[int]]=None)->List[int]:
+        """Fill `out` (one slot per encoder, allocated if None) with the raw counters."""
+        if out is None: out=[0]*ENCODERS
+        for i in range(len(out)):
+            out[i]=_I32.unpack(self._read_stop(REG_CNT_BASE+4*i,4))[0]
+        return out
+
+    def read_all_buttons_raw(self, out:Optional[List[int]]=None)->List[int]:
+        """Fill `out` (one slot per button, allocated if None) with raw button bytes; -1 marks a failed read."""
+        if out is None: out=[0]*BUTTONS
+        gap=self.timing.btn_gap_s
+        for i in range(len(out)):
+            try: out[i]=self._read_stop(REG_BTN_BASE+i,1)[0]
+            except Exception: out[i]=-1
+            if gap: time.sleep(gap)
+        return out
+
+    def read_switch(self)->Optional[int]:
+        try:
+            v=self._read_stop(REG_SWITCH,1)[0]
+            v=1 if v>0 else 0
+            return (1-v) if SWITCH_INVERT else v
+        except Exception:
+            return None
+
+    def set_led_rgb_dual(self, idx:int, r:int, g:int, b:int):
+        """Write to BOTH plausible addresses for this index."""
+        if not (0 <= idx <= 8): return
+        r=max(0,min(255,int(r))); g=max(0,min(255,int(g))); b=max(0,min(255,int(b)))
+        # bank0 0..8
+        try: self._write_stop(REG_LED_BANK0 + 3*idx, bytes((r,g,b)))
+        except Exception: pass
+        # bank1 5..8
+        if idx >= 5:
+            try: self._write_stop(REG_LED_BANK1 + 3*(idx-5), bytes((r,g,b)))
+            except Exception: pass
+
+    def hard_off_all_leds(self):
+        # bank0 0..8
+        for idx in range(0,LEDS):
+            try: self._write_stop(REG_LED_BANK0 + 3*idx, b"\x00\x00\x00")
+            except Exception: pass
+        # bank1 5..8
+        for idx in range(5,LEDS):
+            try: self._write_stop(REG_LED_BANK1 + 3*(idx-5), b"\x00\x00\x00")
+            except Exception: pass
+
+    def reset_counter(self, idx:int):
+        if not (0 <= idx < ENCODERS): return
+        try: self._write_stop(REG_RST_BASE+idx, b"\x01")
+        except Exception:
+            try: self._write_stop(REG_RST_BASE+idx, b"\xFF")
+            except Exception: pass
+
+def _errno(e:Exception)->int:
+    err=getattr(e,"errno",None)
+    return err if isinstance(err,int) and 0<err<0x8000 else -1
+
+class M5_8EncoderReplay(M5_8EncoderStopOnly):
+    """Answers register calls from a captured trace instead of the bus."""
+    def __init__(self, src:ReplaySource, addr:int=0x41):
+        super().__init__(None, addr, I2CTiming(0.0, 0.0, 0.0, 1, LOOP_HZ))
+        self.src=src
+
+    def _read_stop(self, reg:int, n:int)->bytes:
+        self.stats.ops+=1
+        r=self.src.take(False, reg)
+        if r is None or r[5]:
+            self.stats.failures+=1
+            raise error_for(r[5] if r else 61)   # ENODATA: not in trace
+        return r[6][:n].ljust(n, b"\0")
+
+    def _write_stop(self, reg:int, data:bytes):
+        self.stats.ops+=1
+        r=self.src.take(True, reg)
+        if r is not None and r[5]:              # writes missing from the trace just succeed
+            self.stats.failures+=1
+            raise error_for(r[5])
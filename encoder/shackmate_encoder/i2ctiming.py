@@ -0,0 +1,199 @@
+"""
+ShackMate encoder I2C timing - calibration, per-device storage, runtime drift.
+
+The STOP-only protocol needs a short pause between the register write and the
+read, a gap between button reads, and retries with backoff. The right values
+depend on firmware and cabling, so they live in an I2CTiming object owned by
+the device instead of module constants.
+
+  calibrate()     sweeps pause/gap from slow to fast against a device (anything
+                  with .timing, .stats and the read_* methods), keeps the fastest
+                  error-free values and picks a loop rate from the cycle time.
+                  backoff_base and max_retries are not swept; they keep their
+                  defaults.
+  TimingStore     JSON file keyed by bus/address/firmware version.
+  AdaptiveTuner   watches the rate of retries that recovered while serving; backs
+                  off one notch when it drifts up (windows with hard failures,
+                  i.e. the device offline, are ignored), re-fits the loop rate to
+                  the slower reads, and creeps back toward the calibrated values
+                  after a clean stretch.
+"""
+
+import json, os, time
+from typing import Dict, Optional, Tuple
+from . import smlog
+
+# ---------- Config ----------
+PAUSE_STEPS      = (0.002, 0.001, 0.0005, 0.00025, 0.0001, 0.00005, 0.0)   # slow -> fast
+GAP_STEPS        = PAUSE_STEPS
+LOOP_HZ_STEPS    = (50, 80, 100, 125, 160, 200)
+LOOP_BUDGET      = 0.5      # read pass may use at most this share of the loop period (read + sleep)
+CAL_CYCLES       = 200
+TIMING_FILE      = os.environ.get("SM_TIMING_FILE",
+                                  os.path.expanduser("~/.config/shackmate/encoder-timing.json"))
+
+TUNE_WINDOW_S    = 5.0
+TUNE_MAX_ERR     = 0.01     # retries per transaction that triggers a back-off
+TUNE_RELAX_S     = 60.0     # clean time before stepping back toward calibrated
+
+log_cal = smlog.get("cal")
+
+class I2CTiming:
+    """Timing knobs read by the device on every transaction."""
+    __slots__=("pause_s","btn_gap_s","backoff_base","max_retries","loop_hz")
+    FIELDS=__slots__
+    def __init__(self, pause_s:float, btn_gap_s:float, backoff_base:float, max_retries:int, loop_hz:int):
+        self.pause_s, self.btn_gap_s = pause_s, btn_gap_s
+        self.backoff_base, self.max_retries, self.loop_hz = backoff_base, max_retries, loop_hz
+    def copy(self)->"I2CTiming": return I2CTiming(*(getattr(self,f) for f in self.FIELDS))
+    def to_dict(self)->dict: return {f:getattr(self,f) for f in self.FIELDS}
+    def update(self, d:dict):
+        for f in self.FIELDS:
+            if f in d: setattr(self, f, type(getattr(self,f))(d[f]))
+    def __repr__(self):
+        return ("I2CTiming(pause_s=%g, btn_gap_s=%g, backoff_base=%g, max_retries=%d, loop_hz=%d)"
+                % (self.pause_s, self.btn_gap_s, self.backoff_base, self.max_retries, self.loop_hz))
+
+class I2CStats:
+    """Transaction counters bumped by the device's retry loops.
+
+    `recovered` counts retries of calls that then succeeded (timing drift);
+    `failures` counts calls that ran out of retries (device gone).
+    """
+    __slots__=("ops","retries","failures","recovered")
+    def __init__(self): self.ops=self.retries=self.failures=self.recovered=0
+    def snapshot(self)->Tuple[int,int,int,int]: return (self.ops, self.retries, self.failures, self.recovered)
+
+def device_key(bus:int, addr:int, fw:Optional[int])->str:
+    return f"i2c{bus}:{addr:#04x}:fw{'?' if fw is None else fw}"
+
+# ---------- Storage ----------
+class TimingStore:
+    def __init__(self, path:str=TIMING_FILE): self.path=path
+    def _load_all(self)->Dict[str,dict]:
+        try:
+            with open(self.path) as f: d=json.load(f)
+            return d if isinstance(d,dict) else {}
+        except (OSError, ValueError):
+            return {}
+    def load(self, key:str)->Optional[dict]:
+        return self._load_all().get(key)
+    def save(self, key:str, timing:I2CTiming, **meta):
+        d=self._load_all()
+        d[key]={**timing.to_dict(), **meta, "saved":time.strftime("%Y-%m-%d %H:%M:%S")}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp=self.path+".tmp"
+        with open(tmp,"w") as f: json.dump(d, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+# ---------- Calibration ----------
+def _read_pass(dev):
+    dev.read_all_counters(); dev.read_all_buttons_raw(); dev.read_switch()
+
+def _measure(dev, cycles:int)->Tuple[int,float]:
+    """Run `cycles` full read passes; return (errors, mean cycle seconds)."""
+    s0=dev.stats.snapshot(); t0=time.perf_counter(); hard=0
+    for _ in range(cycles):
+        try: _read_pass(dev)
+        except Exception: hard+=1
+    dt=(time.perf_counter()-t0)/max(1,cycles); s1=dev.stats.snapshot()
+    return (s1[1]-s0[1])+(s1[2]-s0[2])+hard, dt
+
+def _sweep(dev, attr:str, steps, cycles:int)->float:
+    best=getattr(dev.timing, attr)
+    for v in steps:
+        setattr(dev.timing, attr, v)
+        errs, dt = _measure(dev, cycles)
+        log_cal.info("%s=%g: %d errors, %.2f ms/cycle", attr, v, errs, dt*1000.0)
+        if errs: break
+        best=v
+    setattr(dev.timing, attr, best)
+    return best
+
+def calibrate(dev, cycles:int=CAL_CYCLES)->I2CTiming:
+    """Tune dev.timing in place against the live device and return a copy.
+
+    Pause and button gap are swept slow -> fast; the sweep stops at the first
+    setting that produces a retry or failure and keeps the previous one. If the
+    combined setting still errs, both step back one notch at a time.
+    """
+    t=dev.timing
+    # start from the slowest settings so the gap sweep isn't skewed by pause errors
+    t.pause_s, t.btn_gap_s = PAUSE_STEPS[0], GAP_STEPS[0]
+    _sweep(dev, "pause_s", PAUSE_STEPS, cycles)
+    _sweep(dev, "btn_gap_s", GAP_STEPS, cycles)
+
+    errs, dt = _measure(dev, cycles)
+    while errs and (t.pause_s<PAUSE_STEPS[0] or t.btn_gap_s<GAP_STEPS[0]):
+        # each value was clean alone but not together: step both back a notch
+        t.pause_s=_slower(PAUSE_STEPS, t.pause_s); t.btn_gap_s=_slower(GAP_STEPS, t.btn_gap_s)
+        errs, dt = _measure(dev, cycles)
+        log_cal.info("stepped back to pause=%g gap=%g: %d errors, %.2f ms/cycle", t.pause_s, t.btn_gap_s, errs, dt*1000.0)
+    if errs: log_cal.warning("still %d errors at the slowest settings; check wiring and pull-ups", errs)
+    t.loop_hz=_fit_loop_hz(dt)
+    log_cal.info("calibrated: %r (%d errors, %.2f ms/cycle)", t, errs, dt*1000.0)
+    return t.copy()
+
+def _fit_loop_hz(cycle_s:float, cap:Optional[int]=None)->int:
+    """Fastest loop rate at which a read pass of cycle_s stays within LOOP_BUDGET of the period.
+
+    EncoderEngine.run sleeps a full 1/loop_hz after every pass, so the period is cycle_s+1/hz.
+    """
+    fit=[hz for hz in LOOP_HZ_STEPS if cycle_s <= LOOP_BUDGET*(cycle_s+1.0/hz) and (cap is None or hz<=cap)]
+    return max(fit) if fit else LOOP_HZ_STEPS[0]
+
+# ---------- Runtime drift ----------
+def _slower(steps, v:float)->float:
+    for s in reversed(steps):          # fast -> slow
+        if s > v: return s
+    return steps[0]
+
+def _faster(steps, v:float, floor:float)->float:
+    for s in steps:                    # slow -> fast
+        if s < v: return max(s, floor)
+    return max(v, floor)
+
+class AdaptiveTuner:
+    """Per-window check of recovered retries; call step() once per data-loop tick."""
+    def __init__(self, dev, floor:I2CTiming, window_s:float=TUNE_WINDOW_S,
+                 max_err:float=TUNE_MAX_ERR, relax_s:float=TUNE_RELAX_S):
+        self.dev, self.floor = dev, floor.copy()
+        self.window_s, self.max_err, self.relax_s = window_s, max_err, relax_s
+        now=time.monotonic()
+        self._next=now+window_s; self._clean_since=now
+        self._last=dev.stats.snapshot()
+        self._cyc_sum=0.0; self._cyc_n=0
+
+    def step(self, now:Optional[float]=None, cycle_s:Optional[float]=None):
+        """`cycle_s` is how long this tick's read pass took (used to re-fit loop_hz)."""
+        if cycle_s is not None: self._cyc_sum+=cycle_s; self._cyc_n+=1
+        if now is None: now=time.monotonic()
+        if now < self._next: return
+        self._next=now+self.window_s
+        cur=self.dev.stats.snapshot(); last, self._last = self._last, cur
+        mean_cyc=self._cyc_sum/self._cyc_n if self._cyc_n else None
+        self._cyc_sum=0.0; self._cyc_n=0
+        ops=cur[0]-last[0]; failed=cur[2]-last[2]; soft=cur[3]-last[3]
+        if failed:
+            # device offline or flapping: says nothing about timing, and the clean stretch restarts
+            self._clean_since=now; return
+        if not ops: return
+        t=self.dev.timing; f=self.floor
+        if soft/ops > self.max_err:
+            t.pause_s=_slower(PAUSE_STEPS, t.pause_s); t.btn_gap_s=_slower(GAP_STEPS, t.btn_gap_s)
+            self._clean_since=now
+            log_cal.warning("retry rate %.1f%%: backing off to pause=%g gap=%g",
+                            100.0*soft/ops, t.pause_s, t.btn_gap_s)
+        elif soft:
+            self._clean_since=now
+        elif now-self._clean_since >= self.relax_s and (t.pause_s>f.pause_s or t.btn_gap_s>f.btn_gap_s):
+            t.pause_s=_faster(PAUSE_STEPS, t.pause_s, f.pause_s)
+            t.btn_gap_s=_faster(GAP_STEPS, t.btn_gap_s, f.btn_gap_s)
+            self._clean_since=now
+            log_cal.info("clean for %ds: stepping back to pause=%g gap=%g", int(self.relax_s), t.pause_s, t.btn_gap_s)
+        # while backed off, keep the loop inside its budget (never above the calibrated rate)
+        if t.pause_s==f.pause_s and t.btn_gap_s==f.btn_gap_s: hz=f.loop_hz
+        elif mean_cyc is not None: hz=_fit_loop_hz(mean_cyc, f.loop_hz)
+        else: hz=t.loop_hz
+        if hz!=t.loop_hz:
+            log_cal.info("loop rate %d -> %d Hz", t.loop_hz, hz); t.loop_hz=hz
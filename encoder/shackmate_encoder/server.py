@@ -0,0 +1,109 @@
+"""
+WebSocket front end for an EncoderEngine: pushes a snapshot frame to every
+client when telemetry changes and forwards JSON commands to the engine.
+
+websockets is imported when serving starts, so the engine can be built and
+polled (and the first device read done) before the network stack loads.
+"""
+
+import asyncio, json
+from typing import Any, Dict, Optional, Set
+from . import smlog
+from .core import EncoderEngine
+
+WS_HOST, WS_PORT = "0.0.0.0", 4008
+
+# commands whose effect is pushed to every client right after the ack
+_BROADCAST_CMDS = frozenset(("set_encoder_colors","clear_encoder_colors","set_default_colors",
+                             "set_switch_colors","reset","reset_all","set_led","clear_led"))
+
+log_cmd, log_ws = smlog.get("cmd"), smlog.get("ws")
+
+class EncoderWSServer:
+    def __init__(self, engine:Optional[EncoderEngine]=None, host:str=WS_HOST, port:int=WS_PORT, **engine_kw):
+        self.engine=engine or EncoderEngine(**engine_kw)
+        self.host, self.port = host, port
+        self.clients:Set[Any]=set()
+        self._sent_version=-1
+        self._client_ver:Dict[Any,int]={}   # ws -> state version of the last frame it was sent
+        self._stop:Optional[asyncio.Event]=None   # made in run(): on 3.9 an Event binds to the loop current at creation
+        self._stopping=False
+
+    # ---- commands ----
+    async def handle_cmd(self, ws, obj:dict):
+        if isinstance(obj,dict) and obj.get("cmd")=="get":
+            # engine.command answers "get" with snapshot(); send it from the per-version frame cache
+            try: await self._send_frame(ws)
+            except Exception: pass
+            return
+        reply=await self.engine.command(obj)
+        if reply["ok"]: log_cmd.debug("CMD ok: %s", reply)
+        else:           log_cmd.warning("CMD err: %s", reply["error"])
+        await ws.send(json.dumps(reply))
+        if reply["ok"] and reply.get("cmd") in _BROADCAST_CMDS: await self.broadcast_snapshot()
+
+    # ---- broadcasting ----
+    async def broadcast_if_changed(self):
+        if not self.clients or self.engine.sync_version()==self._sent_version: return
+        await self._broadcast(force=False)
+
+    async def broadcast_snapshot(self): await self._broadcast(force=True)
+
+    async def _broadcast(self, force:bool):
+        # clients that already got this version (greeting or "get" reply) are skipped unless forced
+        eng=self.engine; sent=self._client_ver
+        msg=eng.encoded_snapshot(); v=self._sent_version=eng.snap.version; dead=set()
+        for ws in list(self.clients):
+            if not force and sent.get(ws)==v: continue
+            try: await ws.send(msg); sent[ws]=v
+            except Exception: dead.add(ws)
+        for ws in dead: self.clients.discard(ws); sent.pop(ws,None)
+
+    async def _send_frame(self, ws):
+        eng=self.engine; msg=eng.encoded_snapshot(); v=eng.snap.version
+        await ws.send(msg); self._client_ver[ws]=v
+
+    # ---- websocket ----
+    async def ws_handler(self, websocket, path=None):
+        addr=getattr(websocket,"remote_address",None)
+        log_ws.info("🔌 WS client connected: %s", addr)
+        self.clients.add(websocket)
+        try:
+            await self._send_frame(websocket)
+            async for message in websocket:
+                try: obj=json.loads(message)
+                except Exception:
+                    try: await websocket.send(json.dumps({"ok":False,"error":"invalid JSON"}))
+                    except Exception: pass
+                    continue
+                await self.handle_cmd(websocket, obj)
+        except Exception:
+            pass
+        finally:
+            self.clients.discard(websocket); self._client_ver.pop(websocket,None)
+            log_ws.info("🔌 WS client disconnected: %s", addr)
+
+    async def ws_server(self):
+        import websockets
+        log_ws.info("[WS] Serving on ws://%s:%d", self.host, self.port)
+        async with websockets.serve(self.ws_handler, self.host, self.port):
+            await self._stop.wait()
+
+    # ---- lifecycle ----
+    async def run(self):
+        self._stop=asyncio.Event()
+        if self._stopping: self._stop.set()
+        # the data loop starts first so a state frame is ready when the port binds
+        tasks=[asyncio.create_task(self.engine.run(self._stop, self.broadcast_if_changed)),
+               asyncio.create_task(self.ws_server())]
+        try: await asyncio.gather(*tasks)
+        finally:
+            for t in tasks:
+                if not t.done(): t.cancel()
+            try: await asyncio.gather(*tasks, return_exceptions=True)
+            except Exception: pass
+
+    def stop(self):
+        self._stopping=True
+        if self._stop: self._stop.set()
+    def cleanup(self): self.engine.close()
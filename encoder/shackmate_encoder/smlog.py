@@ -0,0 +1,188 @@
+"""
+ShackMate encoder logging - structured, non-blocking, rate-limited.
+
+Log calls made on the data loop only build a LogRecord and push it onto a
+bounded queue; a background listener thread does the formatting and the
+(possibly blocking) stdout write. When the queue is full, records are dropped
+and counted instead of stalling the loop.
+
+Categories are child loggers of "sm" (sm.enc, sm.btn, sm.sw, sm.cmd, sm.ws,
+sm.loop). Each category is token-bucket limited; suppressed records are
+reported once per summary period. High-rate counters (encoder detents) go
+through tally() and come out as one line per period, e.g.
+"enc3: +57 detents in 1s".
+
+Levels come from SM_LOG_LEVEL ("INFO" or "INFO,enc=WARNING,cmd=DEBUG") and can
+be changed at runtime with set_level(); a level without a category applies to
+all categories and clears their overrides.
+"""
+
+import atexit, logging, os, queue, sys, threading, time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List, Optional
+
+# ---------- Config ----------
+ROOT              = "sm"
+QUEUE_MAX         = 4096
+SUMMARY_PERIOD_S  = 1.0
+RATE_PER_S        = 10.0     # sustained records/s per category
+RATE_BURST        = 20
+LEVEL_ENV         = "SM_LOG_LEVEL"
+FORMAT, DATEFMT   = "%(asctime)s %(levelname).1s [%(name)s] %(message)s", "%H:%M:%S"
+
+_SUMMARY = {"sm_summary": True}   # extra= marker: bypasses the rate limit
+
+_loggers:Dict[str,logging.Logger]={}
+def get(category:str)->logging.Logger:
+    lg=_loggers.get(category)
+    if lg is None: lg=_loggers[category]=logging.getLogger(f"{ROOT}.{category}")
+    return lg
+
+def _level(v)->int:
+    if isinstance(v,int): return v
+    lv=logging.getLevelName(str(v).strip().upper())
+    if not isinstance(lv,int): raise ValueError(f"unknown log level '{v}'")
+    return lv
+
+# ---------- Pipeline pieces ----------
+class _RateLimit(logging.Filter):
+    """Token bucket per category; counts what it suppresses."""
+    def __init__(self, rate:float, burst:int):
+        super().__init__()
+        self.rate, self.burst = rate, float(burst)
+        self._buckets:Dict[str,List[float]]={}   # name -> [tokens, last_t]
+        self._suppressed:Dict[str,int]={}
+        self._lock=threading.Lock()
+
+    def filter(self, record:logging.LogRecord)->bool:
+        if getattr(record,"sm_summary",False): return True
+        now=time.monotonic()
+        with self._lock:
+            b=self._buckets.get(record.name)
+            if b is None: b=self._buckets[record.name]=[self.burst, now]
+            b[0]=min(self.burst, b[0]+(now-b[1])*self.rate); b[1]=now
+            if b[0]>=1.0:
+                b[0]-=1.0; return True
+            self._suppressed[record.name]=self._suppressed.get(record.name,0)+1
+            return False
+
+    def take_suppressed(self)->Dict[str,int]:
+        with self._lock:
+            s, self._suppressed = self._suppressed, {}
+        return s
+
+class _DropQueueHandler(QueueHandler):
+    """Bounded queue, drop-on-full; formatting is left to the listener thread."""
+    def __init__(self, q:queue.Queue):
+        super().__init__(q); self.dropped=0
+    def prepare(self, record): return record
+    def enqueue(self, record):
+        try: self.queue.put_nowait(record)
+        except queue.Full: self.dropped+=1
+
+class _Tally:
+    """Per-key counters summed on the hot path and emitted once per period."""
+    def __init__(self):
+        self._acc:Dict[str,list]={}   # key -> [total, unit, logger]
+        self._lock=threading.Lock()
+    def add(self, key:str, n:int, unit:str, logger:logging.Logger):
+        with self._lock:
+            e=self._acc.get(key)
+            if e is None: self._acc[key]=[n, unit, logger]
+            else: e[0]+=n
+    def take(self)->Dict[str,list]:
+        with self._lock:
+            a, self._acc = self._acc, {}
+        return a
+
+class _Pipeline:
+    def __init__(self, stream, qmax:int, period:float, rate:float, burst:int):
+        self.period=period
+        self.handler=_DropQueueHandler(queue.Queue(qmax))
+        self.limit=_RateLimit(rate, burst); self.handler.addFilter(self.limit)
+        out=logging.StreamHandler(stream); out.setFormatter(logging.Formatter(FORMAT, DATEFMT))
+        self.listener=QueueListener(self.handler.queue, out)
+        self.tally=_Tally()
+        self._stop=threading.Event()
+        self._thr=threading.Thread(target=self._summary_loop, name="sm-log-summary", daemon=True)
+
+    def start(self):
+        self.listener.start(); self._thr.start()
+
+    def stop(self):
+        self._stop.set(); self._thr.join(timeout=2*self.period)
+        self.flush_summaries()
+        self.listener.stop()
+
+    def _summary_loop(self):
+        while not self._stop.wait(self.period):
+            self.flush_summaries()
+
+    def flush_summaries(self):
+        p=f"{self.period:g}s"
+        for key,(total,unit,lg) in self.tally.take().items():
+            if total: lg.info("%s: %+d %s in %s", key, total, unit, p, extra=_SUMMARY)
+        for name,n in self.limit.take_suppressed().items():
+            logging.getLogger(name).warning("%d messages suppressed in %s", n, p, extra=_SUMMARY)
+        dropped, self.handler.dropped = self.handler.dropped, 0
+        if dropped:
+            logging.getLogger(ROOT).warning("log queue full: %d records dropped", dropped, extra=_SUMMARY)
+
+_pipe:Optional[_Pipeline]=None
+
+# ---------- Public API ----------
+def setup(spec:Optional[str]=None, stream=None, qmax:int=QUEUE_MAX,
+          period:float=SUMMARY_PERIOD_S, rate:float=RATE_PER_S, burst:int=RATE_BURST):
+    """Install the queue pipeline on the "sm" logger (idempotent).
+
+    `spec` uses the SM_LOG_LEVEL syntax and defaults to that variable, else INFO.
+    """
+    global _pipe
+    if _pipe is not None: return
+    _pipe=_Pipeline(stream or sys.stdout, qmax, period, rate, burst)
+    root=logging.getLogger(ROOT)
+    root.addHandler(_pipe.handler); root.propagate=False; root.setLevel(logging.INFO)
+    apply_spec(spec if spec is not None else os.environ.get(LEVEL_ENV, "INFO"))
+    _pipe.start()
+    atexit.register(shutdown)
+
+def shutdown():
+    """Flush pending summaries and drain the queue."""
+    global _pipe
+    if _pipe is None: return
+    p, _pipe = _pipe, None
+    p.stop()
+    logging.getLogger(ROOT).removeHandler(p.handler)
+
+def apply_spec(spec:str):
+    """Apply "LEVEL[,category=LEVEL...]"; bad entries are logged and skipped.
+
+    The bare LEVEL is applied first, so category entries win wherever they appear.
+    """
+    parts=[p.strip() for p in (spec or "").split(",") if p.strip()]
+    for part in sorted(parts, key=lambda p: "=" in p):
+        cat,lv=part.split("=",1) if "=" in part else (None,part)
+        if cat is not None:
+            cat=cat.strip()
+            if not cat:
+                logging.getLogger(ROOT).warning("%s: ignoring '%s' (empty category)", LEVEL_ENV, part); continue
+        try: set_level(lv, cat)
+        except ValueError as e: logging.getLogger(ROOT).warning("%s: ignoring '%s' (%s)", LEVEL_ENV, part, e)
+
+def set_level(level, category:Optional[str]=None)->str:
+    """Set the level for one category, or for all when None; returns the level name.
+
+    With no category the level goes on the "sm" logger and every category's own
+    level is cleared (NOTSET), so earlier per-category overrides stop applying.
+    """
+    lv=_level(level)
+    if category: get(category).setLevel(lv); return logging.getLevelName(lv)
+    for lg in _loggers.values(): lg.setLevel(logging.NOTSET)
+    logging.getLogger(ROOT).setLevel(lv)
+    return logging.getLevelName(lv)
+
+def tally(key:str, n:int, unit:str="detents", category:str="enc"):
+    """Accumulate `n` under `key`; emitted as one INFO summary per period."""
+    if _pipe is None or not n: return
+    lg=get(category)
+    if lg.isEnabledFor(logging.INFO): _pipe.tally.add(key, n, unit, lg)
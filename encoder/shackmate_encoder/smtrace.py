@@ -0,0 +1,119 @@
+"""
+ShackMate encoder trace - compact binary ring of I2C register transactions.
+
+Capture: TraceWriter memory-maps a fixed-size file and packs one 20-byte record
+per transaction attempt (monotonic ns, op, register, length, attempt, errno,
+up to 4 data bytes). Recording is a single struct.pack_into() into the map, and
+the kernel writes pages back in the background. When the ring is full, the
+oldest records are overwritten.
+
+Replay: TraceReader yields the records oldest -> newest. ReplaySource hands them
+back one transaction at a time, matched by register, so a device stub can
+answer reads and writes with the recorded results and errors.
+
+File layout:
+  header  "<4sHHIQ12x" magic b"SMTR", version, record size, capacity, total written
+  records "<QBBBBh2x4s" t_ns, flags, reg, n, attempt, err, data
+"""
+
+import mmap, os, struct
+from typing import Iterator, Optional, Tuple
+
+MAGIC, VERSION = b"SMTR", 1
+_HDR = struct.Struct("<4sHHIQ12x")
+_REC = struct.Struct("<QBBBBh2x4s")
+_COUNT_OFF = 12                          # offset of "total written" in the header
+_COUNT = struct.Struct("<Q")
+
+F_WRITE, F_FINAL = 0x01, 0x02            # flags: write (else read); last attempt of the call
+DEFAULT_RECORDS = 1 << 20                # ~20 MB, ~7 min at 80Hz
+MAX_RECORDS     = 0xFFFFFFFF             # header field is uint32
+SCAN_LIMIT = 64                          # records searched for a matching register
+
+Record = Tuple[int, int, int, int, int, int, bytes]   # t_ns, flags, reg, n, attempt, err, data
+
+class TraceWriter:
+    def __init__(self, path:str, records:int=DEFAULT_RECORDS):
+        if not 1 <= records <= MAX_RECORDS: raise ValueError(f"records must be 1..{MAX_RECORDS}, got {records}")
+        self.path, self.cap, self.count = path, records, 0
+        size=_HDR.size + records*_REC.size
+        self._f=open(path, "w+b"); self._f.truncate(size)
+        self._m=mmap.mmap(self._f.fileno(), size)
+        _HDR.pack_into(self._m, 0, MAGIC, VERSION, _REC.size, records, 0)
+
+    def record(self, t_ns:int, flags:int, reg:int, n:int, attempt:int, err:int, data:bytes):
+        c=self.count
+        _REC.pack_into(self._m, _HDR.size + (c % self.cap)*_REC.size,
+                       t_ns, flags, reg & 0xFF, n & 0xFF, attempt & 0xFF, err, data)
+        self.count=c+1
+        _COUNT.pack_into(self._m, _COUNT_OFF, c+1)
+
+    def close(self):
+        if self._m is None: return
+        self._m.flush(); self._m.close(); self._f.close(); self._m=None
+
+class TraceReader:
+    def __init__(self, path:str):
+        with open(path, "rb") as f: self._buf=f.read()
+        magic, ver, rsz, self.cap, self.count = _HDR.unpack_from(self._buf, 0)
+        if magic!=MAGIC or ver!=VERSION or rsz!=_REC.size:
+            raise ValueError(f"{path}: not a v{VERSION} encoder trace")
+
+    @property
+    def wrapped(self)->bool: return self.count > self.cap
+
+    def __len__(self)->int: return min(self.count, self.cap)
+
+    def __iter__(self)->Iterator[Record]:
+        n=len(self); start=(self.count % self.cap) if self.wrapped else 0
+        for k in range(n):
+            t, fl, reg, ln, att, err, data = _REC.unpack_from(self._buf, _HDR.size + ((start+k) % self.cap)*_REC.size)
+            yield t, fl, reg, ln, att, err, data[:ln]
+
+class ReplaySource:
+    """Serves recorded transactions to a replaying device, one logical call at a time.
+
+    A call consumes its recorded attempts up to the one flagged final. Records
+    that don't match the requested op/register (e.g. the capture started mid-tick
+    or the processing code now issues different writes) are skipped and counted.
+    """
+    def __init__(self, reader:TraceReader):
+        self._recs=list(reader); self._i=0
+        self.skipped=0; self.unmatched=0
+
+    @property
+    def exhausted(self)->bool: return self._i >= len(self._recs)
+
+    @property
+    def position(self)->int: return self._i
+
+    def skip(self, n:int):
+        self._i=min(len(self._recs), self._i+n); self.skipped+=n
+
+    def skip_writes(self)->bool:
+        """Drop leftover write records; False once the trace is exhausted."""
+        recs=self._recs; i=self._i
+        while i < len(recs) and recs[i][1] & F_WRITE: i+=1
+        self.skipped+=i-self._i; self._i=i
+        return i < len(recs)
+
+    def now(self)->float:
+        """Monotonic seconds of the next record (the replay clock)."""
+        i=min(self._i, len(self._recs)-1)
+        return self._recs[i][0]/1e9 if self._recs else 0.0
+
+    def take(self, write:bool, reg:int)->Optional[Record]:
+        """Consume the next call for (op, reg); return its final record, or None if not found."""
+        want=F_WRITE if write else 0; recs=self._recs; i=self._i
+        for j in range(i, min(len(recs), i+SCAN_LIMIT)):
+            r=recs[j]
+            if (r[1] & F_WRITE)==want and r[2]==reg & 0xFF:
+                k=j
+                while not (recs[k][1] & F_FINAL) and k+1 < len(recs) and recs[k+1][2]==r[2]: k+=1
+                self.skipped+=j-i; self._i=k+1
+                return recs[k]
+        self.unmatched+=1
+        return None
+
+def error_for(err:int)->OSError:
+    return OSError(err, os.strerror(err)) if err>0 else OSError("replayed I2C error")